@@ -1,6 +1,7 @@
 """Agent Definitions for Documentation Generation using Azure AI Foundry Agent SDK"""
 
 import os
+import threading
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential
 
@@ -13,7 +14,24 @@ except ImportError:
     AGENT_SDK_AVAILABLE = False
     AgentsClient = None  # type: ignore
 
+# Process-wide client/agent singletons. Only successful results are kept, and
+# the lock stops concurrent workflow runs from bootstrapping (and creating
+# duplicate agents) simultaneously. Reentrant: agent setup fetches the client.
+_bootstrap_lock = threading.RLock()
+_agent_client = None
+_foundry_agents = None
+
+
 def get_agent_client():
+    """Return the shared Azure AI Agents Client, creating it on first success"""
+    global _agent_client
+    with _bootstrap_lock:
+        if _agent_client is None:
+            _agent_client = _new_agent_client()
+        return _agent_client
+
+
+def _new_agent_client():
     """Initialize Azure AI Agents Client"""
     if not AGENT_SDK_AVAILABLE:
         return None
@@ -91,10 +109,21 @@ def create_foundry_agents():
     """
     Create and configure 4 specialized agents using Azure AI Foundry Agent SDK.
     This is the SDK-based alternative to portal-based agent creation.
+    A successful result is kept for the process, so repeated workflow runs
+    reuse the same agents; failures are retried on the next call.
     
     Returns:
         dict: Dictionary containing agent IDs and metadata
     """
+    global _foundry_agents
+    with _bootstrap_lock:
+        if not _foundry_agents:
+            _foundry_agents = _create_foundry_agents()
+        return _foundry_agents
+
+
+def _create_foundry_agents():
+    """Create (or look up) the 4 agents; see create_foundry_agents"""
     if not AGENT_SDK_AVAILABLE:
         print("⚠️  Azure AI Foundry Agent SDK not available.")
         print("   Install with: pip install azure-ai-agents")
@@ -106,6 +135,9 @@ def create_foundry_agents():
         return {}
     
     model_deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4o-mini")
+    # The analyzer only emits structured JSON findings, so it can run on a smaller,
+    # faster deployment; the writing agents stay on the main model.
+    analyzer_deployment = os.getenv("ANALYZER_DEPLOYMENT_NAME", model_deployment)
     
     try:
         # Import tools for agent functions
@@ -187,7 +219,7 @@ Ensure traceability and completeness.""",
         else:
             print("   Creating CodeAnalyzerAgent...")
             code_analyzer = agent_client.create_agent(
-            model=model_deployment,
+            model=analyzer_deployment,
             name="CodeAnalyzerAgent",
             instructions="""You are a Senior Code & System Intelligence Engineer.
             
@@ -205,7 +237,8 @@ Key capabilities:
 - Architecture pattern identification
 
 Always provide actionable insights and prioritize security concerns.""",
-            tools=[]  # Tools configured separately
+            tools=[],  # Tools configured separately
+            temperature=0  # Deterministic JSON output
         )
         
         # Agent 3: Documentation Generator (create only if not exists)
@@ -430,6 +463,7 @@ if __name__ == "__main__":
     print(f"   AZURE_OPENAI_ENDPOINT: {os.getenv('AZURE_OPENAI_ENDPOINT', 'Not set')}")
     print(f"   AZURE_AI_PROJECT_ENDPOINT: {os.getenv('AZURE_AI_PROJECT_ENDPOINT', 'Not set')}")
     print(f"   DEPLOYMENT_NAME: {os.getenv('DEPLOYMENT_NAME', 'gpt-4o-mini')}")
+    print(f"   ANALYZER_DEPLOYMENT_NAME: {os.getenv('ANALYZER_DEPLOYMENT_NAME', 'same as DEPLOYMENT_NAME')}")
     print(f"   Agent SDK Available: {AGENT_SDK_AVAILABLE}")
     
     # Create agents
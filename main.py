@@ -3,162 +3,774 @@ Main Orchestration Script for Documentation Agent Workflow
 Orchestrates the 4-agent system: DocOrchestrator → CodeAnalyzer → DocGenerator → Formatter
 """
 
+import asyncio
+import io
 import os
 import sys
-from pathlib import Path
+import json
+import multiprocessing
+import re
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.core.credentials import AzureKeyCredential
 
-# Load environment variables
-load_dotenv()
+# The agents module (and with it the Azure Agent SDK) is imported inside
+# run_docagent_workflow, so fallback-only runs never pay for loading it.
+# tools still loads .env at import, since its Blob client reads the environment then.
+from tools import PDF_AVAILABLE, analyze_codebase_advanced, arender, render_document_files, render_documents_advanced
+
+
+# Request sent to the orchestrator; built once, filled in per run
+ORCHESTRATOR_MESSAGE_TEMPLATE = """{prompt}
+
+Codebase: {codebase}
+
+Generate comprehensive documentation with BRD, FRD, NFRD, Security docs, and Architecture overview."""
+
+# Sections generated concurrently, one run each, concatenated in this order
+DOC_SECTIONS = (
+    ("Business Requirements Document (BRD)", "executive summary, stakeholders and business objectives"),
+    ("Functional Requirements Document (FRD)", "system architecture, core features and API endpoints"),
+    ("Non-Functional Requirements Document (NFRD)", "performance, scalability and availability requirements"),
+    ("Security Documentation", "authentication, authorization, data protection and security findings"),
+    ("Architecture Overview", "technology stack, components and deployment architecture"),
+)
+
+SECTION_MESSAGE_TEMPLATE = """{prompt}
+
+Codebase: {codebase}
+
+Write only the "{section}" part of the documentation package, covering {spec}. Start with the heading "## {section}"."""
+
+# Level-2 headings delimit the documents rendered separately (BRD, FRD, ...)
+SECTION_HEADING_RE = re.compile(r'^## +(.+?)\s*$')
+CODE_FENCE_PREFIXES = ('```', '~~~')
+
+# Orchestrator ID from earlier runs, so startup can skip listing/creating agents
+AGENT_CACHE_PATH = "./.agent_cache.json"
+_BOOTSTRAP_LOCK = threading.Lock()
+# (endpoint, orchestrator ID) once verified or created in this process, so later
+# runs skip the cache file and the get_agent round trip
+_verified_orchestrator = None
+
+# Static blocks of the fallback document, pre-encoded once; run_fallback_workflow
+# writes the dynamic fields between them
+_TEMPLATE_HEAD = b"""# Documentation Package
+
+## Project Overview
+Generated based on: """
+
+_TEMPLATE_BRD_FRD = b"""
+
+## Business Requirements Document (BRD)
+
+### Executive Summary
+This document outlines the business requirements for the system.
+
+### Stakeholders
+- Development Team
+- Product Management
+- Quality Assurance
+- Security Team
+
+### Business Objectives
+1. Deliver high-quality documentation
+2. Ensure comprehensive coverage
+3. Maintain security standards
+4. Enable efficient onboarding
+
+## Functional Requirements Document (FRD)
+
+### System Architecture
+"""
+
+_TEMPLATE_FEATURES = b"""
+
+### Core Features
+1. **Feature 1**: Description
+2. **Feature 2**: Description
+3. **Feature 3**: Description
+
+### API Endpoints
+"""
+
+_TEMPLATE_NFRD = b"""
+
+## Non-Functional Requirements Document (NFRD)
+
+### Performance Requirements
+- Response Time: < 200ms for API calls
+- Throughput: 1000 requests/second
+- Availability: 99.9% uptime
+
+### Security Requirements
+- Authentication: OAuth 2.0 / JWT
+- Authorization: Role-Based Access Control (RBAC)
+- Encryption: TLS 1.3 for data in transit
+- Data Protection: AES-256 for data at rest
+
+"""
+
+_TEMPLATE_COMPLIANCE = b"""
+
+### Scalability
+- Horizontal scaling capability
+- Load balancing
+- Caching strategy
+
+## Compliance & Standards
+- GDPR compliance
+- SOC 2 Type II
+- ISO 27001
+
+## Architecture Overview
+
+### Technology Stack
+"""
+
+_TEMPLATE_DEPLOYMENT = b"""
+
+### Deployment Architecture
+- Cloud Platform: Azure
+- Container Orchestration: Kubernetes
+- CI/CD: GitHub Actions
+
+---
+Generated by Azure AI Foundry Documentation Agent
+Date: """
+
+# Run polling: fixed short interval, bounded total wait
+POLL_INTERVAL = 0.5
+RUN_TIMEOUT = 120
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action")
+# An "incomplete" run hit a token cap; its partial text is still kept
+USABLE_RUN_STATUSES = ("completed", "incomplete")
+
+
+def _log(*lines: str):
+    """
+    Write a group of status lines to stdout in a single write and flush.
+    
+    Banners and multi-line summaries go through here instead of one print()
+    per line, which matters when stdout is a pipe or a captured log.
+    """
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def _path_present(path: str) -> bool:
+    """Return True if path can be stat'ed (file, directory or archive)."""
+    try:
+        os.stat(path)
+    except OSError:
+        return False
+    return True
+
+
+def _split_sections(doc: str) -> list[tuple[str, str]]:
+    """
+    Split a documentation package into its level-2 sections.
+    
+    Headings inside fenced code blocks don't start a section. Text before
+    the first heading (the package title) is kept with the first section.
+    Each section is named "<NN>-<heading slug>", so repeated headings still
+    get their own directory.
+    
+    Args:
+        doc: Markdown documentation package
+        
+    Returns:
+        list: (name, markdown) pairs; a single pair if there are no sections
+    """
+    starts = []
+    in_fence = False
+    offset = 0
+    for line in doc.splitlines(keepends=True):
+        if line.lstrip().startswith(CODE_FENCE_PREFIXES):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = SECTION_HEADING_RE.match(line)
+            if match:
+                starts.append((offset, match.group(1)))
+        offset += len(line)
+    
+    if not starts:
+        return [("01-documentation", doc)]
+    
+    bounds = [0] + [start for start, _ in starts[1:]] + [len(doc)]
+    return [
+        (f"{i + 1:02d}-{_section_slug(title)}", doc[bounds[i]:bounds[i + 1]])
+        for i, (_, title) in enumerate(starts)
+    ]
+
+
+def _write_markdown_files(docs: list[tuple[str, bytes]], out_dir: str) -> list[str]:
+    """
+    Write (relative path, bytes) pairs under out_dir, concurrently via arender.
+    
+    asyncio.run can't be used from inside a running event loop (an async
+    host, Jupyter); there the files are written synchronously instead.
+    
+    Returns:
+        list: Written paths, in the order of docs
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(arender(docs, out_dir))
+    
+    paths = []
+    for name, data in docs:
+        path = os.path.join(out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def _section_slug(title: str) -> str:
+    """Turn a section heading into a directory/blob name."""
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-') or 'section'
+
+
+def _render_one(name: str, body: str, out_dir: str) -> list[str]:
+    """
+    Render one section to PDF/DOCX in its own subdirectory of out_dir.
+    
+    Module-level so it can be pickled for ProcessPoolExecutor. The section's
+    markdown is written beforehand by arender.
+    
+    Args:
+        name: Unique section name from _split_sections, used for the
+            subdirectory and blob names
+        body: Section markdown
+        out_dir: Parent output directory
+        
+    Returns:
+        list: Paths of the files this call wrote
+    """
+    return render_document_files(body, os.path.join(out_dir, name), blob_prefix=f"{name}/")["files"]
+
+
+def _render_sections(sections: list[tuple[str, str]], out_dir: str) -> list[list[str]]:
+    """
+    Render every section with _render_one, in worker processes when it pays off.
+    
+    A process pool is only used when PDF generation is available and more than
+    one worker would run; DOCX-only output is cheaper to render in-process than
+    to start interpreters for. If the pool breaks (e.g. a caller script without
+    an ``if __name__ == "__main__"`` guard, which spawned workers re-import),
+    the sections are rendered one after another instead.
+    
+    Args:
+        sections: (name, body) pairs from _split_sections
+        out_dir: Parent output directory
+        
+    Returns:
+        list: Per-section lists of the files written, in section order
+    """
+    workers = min(os.cpu_count() or 1, len(sections))
+    if workers > 1 and PDF_AVAILABLE:
+        try:
+            # spawn, not fork: this may run on a batch worker thread while other
+            # threads hold locks (stdout, SDK connection pools, the blob client)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                return list(pool.map(_render_one, *zip(*sections), [out_dir] * len(sections)))
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"   ⚠️  Render workers failed ({type(e).__name__}), rendering sections in-process")
+    return [_render_one(name, body, out_dir) for name, body in sections]
+
+
+def _load_cached_orchestrator_id(agent_client) -> str | None:
+    """
+    Return the orchestrator ID saved by a previous run if it still exists.
+    
+    The cached ID is only trusted for the project endpoint it was saved
+    with, and is dropped when the service reports the agent as gone.
+    
+    Args:
+        agent_client: AgentsClient used to confirm the agent exists
+        
+    Returns:
+        str | None: Orchestrator agent ID, or None if it must be (re)created
+    """
+    try:
+        with open(AGENT_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict):
+        return None
+    
+    agent_id = cached.get("orchestrator_id")
+    if not agent_id or cached.get("endpoint") != os.getenv("AZURE_AI_PROJECT_ENDPOINT"):
+        return None
+    
+    from azure.core.exceptions import AzureError, ResourceNotFoundError
+    
+    try:
+        agent_client.get_agent(agent_id)
+    except ResourceNotFoundError:
+        return None
+    except AzureError as e:
+        print(f"   ⚠️  Could not verify cached agent {agent_id}: {e}")
+        return None
+    return agent_id
+
+
+def _save_orchestrator_id(agent_id: str):
+    """
+    Persist the orchestrator ID for the next run.
+    
+    Args:
+        agent_id: Orchestrator agent ID
+    """
+    cache_dir = os.path.dirname(os.path.abspath(AGENT_CACHE_PATH))
+    tmp_path = None
+    try:
+        # Write a sibling temp file and swap it in, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix='.agent_cache.', suffix='.tmp', dir=cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"endpoint": os.getenv("AZURE_AI_PROJECT_ENDPOINT"), "orchestrator_id": agent_id}, f)
+        os.replace(tmp_path, AGENT_CACHE_PATH)
+    except OSError as e:
+        print(f"   ⚠️  Could not write agent cache: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _exec_tool(call):
+    """
+    Execute a single function tool call requested by the agent.
+    
+    Args:
+        call: RequiredFunctionToolCall from a requires_action run
+        
+    Returns:
+        ToolOutput: Output to submit back to the run
+    """
+    from azure.ai.agents.models import ToolOutput
+    
+    name = call.function.name
+    try:
+        arguments = json.loads(call.function.arguments or "{}")
+        if name == "analyze_codebase_advanced":
+            output = analyze_codebase_advanced(**arguments)
+        elif name == "render_documents_advanced":
+            output = render_documents_advanced(**arguments)
+        else:
+            output = json.dumps({"error": f"Unknown tool: {name}"})
+    except Exception as e:
+        output = json.dumps({"error": f"{name} failed: {e}"})
+    
+    return ToolOutput(tool_call_id=call.id, output=str(output))
+
+
+def _exec_tools(calls) -> list:
+    """
+    Execute all tool calls of one requires_action step concurrently.
+    
+    The tools are I/O bound (filesystem scans, blob uploads), so running
+    them side by side makes the step take as long as the slowest call.
+    
+    Args:
+        calls: RequiredFunctionToolCall objects from the run
+        
+    Returns:
+        list: ToolOutputs in the same order as calls
+    """
+    if len(calls) <= 1:
+        return [_exec_tool(call) for call in calls]
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(calls))) as executor:
+        return list(executor.map(_exec_tool, calls))
 
-# Import agent utilities
-from agents import create_foundry_agents, get_agent_client, AGENT_SDK_AVAILABLE
-from tools import analyze_codebase_advanced, render_documents_advanced
 
-# Check SDK availability
-if AGENT_SDK_AVAILABLE:
-    from azure.ai.agents import AgentsClient
-    from azure.ai.agents.models import ThreadMessage, MessageRole
-else:
-    AgentsClient = None  # type: ignore
-    ThreadMessage = None  # type: ignore
-    MessageRole = None  # type: ignore
+def _poll_run(agent_client, run, timeout: float = RUN_TIMEOUT):
+    """
+    Poll a run until it leaves the active states, answering tool calls on the way.
+    
+    The SDK's own polling honours the service's Retry-After, which can stall
+    for seconds on each transition; a short fixed interval keeps the run
+    responsive and the overall timeout bounds the worst case.
+    
+    Args:
+        agent_client: AgentsClient the run was created with
+        run: ThreadRun returned by runs.create
+        timeout: Seconds to wait before cancelling the run
+        
+    Returns:
+        ThreadRun: The run in its final (or cancelled) state
+    """
+    start = time.monotonic()
+    
+    while run.status in ACTIVE_RUN_STATUSES:
+        if run.status == "requires_action" and run.required_action:
+            calls = run.required_action.submit_tool_outputs.tool_calls
+            agent_client.runs.submit_tool_outputs(
+                thread_id=run.thread_id, run_id=run.id, tool_outputs=_exec_tools(calls)
+            )
+        
+        if time.monotonic() - start > timeout:
+            print(f"   ⚠️  Run exceeded {timeout:.0f}s, cancelling...")
+            return agent_client.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+        
+        time.sleep(POLL_INTERVAL)
+        run = agent_client.runs.get(thread_id=run.thread_id, run_id=run.id)
+    
+    return run
 
 
-def run_docagent_workflow(prompt: str, codebase_path: str | None = None):
+def _last_assistant_text(agent_client, thread_id: str) -> str:
+    """
+    Return the text of the last assistant message on a thread.
+    
+    Args:
+        agent_client: AgentsClient the thread belongs to
+        thread_id: Thread to read
+        
+    Returns:
+        str: Message text, or an empty string if the assistant did not reply
+    """
+    last_message_obj = agent_client.messages.get_last_message_text_by_role(
+        thread_id=thread_id,
+        role="assistant"  # type: ignore
+    )
+    
+    if not last_message_obj:
+        return ""
+    
+    # Extract text - it's a MessageTextContent with .text attribute
+    if hasattr(last_message_obj, 'text'):
+        text_obj = last_message_obj.text  # type: ignore
+        return text_obj.value if hasattr(text_obj, 'value') else str(text_obj)
+    return str(last_message_obj)
+
+
+def _generate_section(agent_client, agent_id: str, user_message: str, **run_options):
+    """
+    Generate one documentation section on its own thread.
+    
+    Args:
+        agent_client: AgentsClient to run against
+        agent_id: Agent that writes the section
+        user_message: Section-specific request
+        **run_options: Extra arguments for runs.create (token limits etc.)
+        
+    Returns:
+        tuple: (final ThreadRun, section text)
+    """
+    thread = agent_client.threads.create()
+    agent_client.messages.create(thread_id=thread.id, role="user", content=user_message)  # type: ignore
+    run = _poll_run(agent_client, agent_client.runs.create(thread_id=thread.id, agent_id=agent_id, **run_options))
+    
+    if run.status not in USABLE_RUN_STATUSES:
+        return run, ""
+    return run, _last_assistant_text(agent_client, run.thread_id)
+
+
+def _stream_run(agent_client, thread_id: str, agent_id: str, timeout: float = RUN_TIMEOUT, **run_options):
+    """
+    Run the agent in streaming mode, printing message text as it arrives.
+    
+    Tool outputs are submitted on the same event handler, so the events of
+    the continued run are read by this loop as well. The stream ends once
+    the run reaches a terminal state, and the run is cancelled when it is
+    still active after timeout seconds.
+    
+    Args:
+        agent_client: AgentsClient the thread belongs to
+        thread_id: Thread holding the user message
+        agent_id: Agent to run
+        timeout: Seconds to wait before cancelling the run
+        **run_options: Extra arguments for runs.stream (token limits etc.)
+        
+    Returns:
+        tuple: (final ThreadRun or None, accumulated response text)
+    """
+    from azure.ai.agents.models import AgentStreamEvent, MessageDeltaChunk, ThreadRun
+    
+    buffer = bytearray()
+    run = None
+    start = time.monotonic()
+    
+    with agent_client.runs.stream(thread_id=thread_id, agent_id=agent_id, **run_options) as event_stream:
+        for event_type, event_data, _ in event_stream:
+            if isinstance(event_data, MessageDeltaChunk):
+                text = event_data.text
+                if text:
+                    buffer += text.encode('utf-8')
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+            elif isinstance(event_data, ThreadRun):
+                run = event_data
+                if run.status == "requires_action" and run.required_action:
+                    calls = run.required_action.submit_tool_outputs.tool_calls
+                    agent_client.runs.submit_tool_outputs_stream(
+                        thread_id=run.thread_id,
+                        run_id=run.id,
+                        tool_outputs=_exec_tools(calls),
+                        event_handler=event_stream,
+                    )
+            elif event_type == AgentStreamEvent.ERROR:
+                break
+            elif event_type == AgentStreamEvent.DONE and (run is None or run.status not in ACTIVE_RUN_STATUSES):
+                # A DONE after requires_action closes the first stream only;
+                # the submitted tool outputs continue the run on this handler
+                break
+            
+            if run is not None and run.status in ACTIVE_RUN_STATUSES and time.monotonic() - start > timeout:
+                print(f"\n   ⚠️  Run exceeded {timeout:.0f}s, cancelling...")
+                run = agent_client.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+                break
+    
+    return run, buffer.decode('utf-8')
+
+
+def run_docagent_workflow(
+    prompt: str,
+    codebase_path: str | None = None,
+    output_dir: str = "./outputs",
+    max_completion_tokens: int = 2000,
+    max_prompt_tokens: int = 8000,
+    stream: bool = False,
+    parallel_sections: bool = True,
+):
     """
     Run the complete documentation generation workflow.
     
     Args:
         prompt: User request describing what documentation to generate
         codebase_path: Path to the codebase to analyze (optional)
+        output_dir: Directory for the rendered documents
+        max_completion_tokens: Upper bound on tokens the orchestrator may generate
+        max_prompt_tokens: Upper bound on prompt tokens used across the run.
+            A run that hits either cap ends "incomplete"; its partial text is
+            still rendered and the result status is "incomplete"
+        stream: Stream the response and print it as it is generated
+        parallel_sections: When not streaming, generate each section in its own
+            concurrent run (thread_id/run_id in the result are then lists)
         
     Returns:
         dict: Results containing generated documentation and metadata
     """
-    print("\n" + "=" * 70)
-    print("🚀 Documentation Agent Workflow - Starting")
-    print("=" * 70)
+    _log("\n" + "=" * 70, "🚀 Documentation Agent Workflow - Starting", "=" * 70)
+    
+    from agents import create_foundry_agents, get_agent_client, AGENT_SDK_AVAILABLE
     
     if not AGENT_SDK_AVAILABLE:
-        print("\n⚠️  Azure AI Foundry Agent SDK not available.")
-        print("   Falling back to direct tool execution...\n")
-        return run_fallback_workflow(prompt, codebase_path)
+        _log("\n⚠️  Azure AI Foundry Agent SDK not available.", "   Falling back to direct tool execution...\n")
+        return run_fallback_workflow(prompt, codebase_path, output_dir)
     
     # Initialize agents
     print("\n📋 Step 1: Initializing Agents...")
-    agents = create_foundry_agents()
-    
-    if not isinstance(agents, dict) or 'orchestrator' not in agents:
-        print("⚠️  Could not initialize agents. Using fallback.")
-        return run_fallback_workflow(prompt, codebase_path)
-    
     agent_client = get_agent_client()
     if not agent_client:
         print("⚠️  Could not connect to Agent client. Using fallback.")
-        return run_fallback_workflow(prompt, codebase_path)
+        return run_fallback_workflow(prompt, codebase_path, output_dir)
     
-    orchestrator_id = agents['orchestrator']['id']
+    # Serialized so concurrent batch runs share one cache read/agent setup;
+    # after the first success the ID is reused without touching the network
+    global _verified_orchestrator
+    endpoint = os.getenv("AZURE_AI_PROJECT_ENDPOINT")
+    with _BOOTSTRAP_LOCK:
+        if _verified_orchestrator and _verified_orchestrator[0] == endpoint:
+            orchestrator_id = _verified_orchestrator[1]
+        else:
+            orchestrator_id = _load_cached_orchestrator_id(agent_client)
+            if orchestrator_id:
+                print(f"   ✅ Reusing cached DocOrchestrator ({orchestrator_id})")
+            else:
+                agents = create_foundry_agents()
+                if isinstance(agents, dict) and 'orchestrator' in agents:
+                    orchestrator_id = agents['orchestrator']['id']
+                    _save_orchestrator_id(orchestrator_id)
+            if orchestrator_id:
+                _verified_orchestrator = (endpoint, orchestrator_id)
+    
+    if not orchestrator_id:
+        print("⚠️  Could not initialize agents. Using fallback.")
+        return run_fallback_workflow(prompt, codebase_path, output_dir)
     
     try:
-        # Step 2: Create thread and process run (polls automatically until complete)
-        print("\n💬 Step 2: Creating thread and running agent (auto-polling)...")
+        # Step 2: Create thread and run, then poll with a bounded timeout
+        print("\n💬 Step 2: Creating thread and running agent...")
         
-        user_message = f"""{prompt}
-
-Codebase: {codebase_path or 'Template mode - no codebase provided'}
-
-Generate comprehensive documentation with BRD, FRD, NFRD, Security docs, and Architecture overview."""
+        codebase = codebase_path or 'Template mode - no codebase provided'
+        user_message = ORCHESTRATOR_MESSAGE_TEMPLATE.format(prompt=prompt, codebase=codebase)
         
         print(f"   Using agent: DocOrchestrator ({orchestrator_id})")
         
-        # Use create_thread_and_process_run - it creates thread, adds message, runs agent, and polls
-        from azure.ai.agents.models import AgentThreadCreationOptions, ThreadMessageOptions
-        
-        thread_options = AgentThreadCreationOptions(
-            messages=[ThreadMessageOptions(role="user", content=user_message)]
-        )
-        
-        # This method handles everything: thread creation, message, run, and polling
-        run = agent_client.create_thread_and_process_run(
-            agent_id=orchestrator_id,
-            thread=thread_options
-        )
-        
-        print(f"   Thread: {run.thread_id}")
-        print(f"   Run: {run.id}")
-        print(f"   Status: {run.status}")
-        
-        if run.status != "completed":
-            print(f"\n⚠️  Run did not complete. Status: {run.status}")
-            if hasattr(run, 'last_error') and run.last_error:
-                print(f"   Error: {run.last_error}")
-            return {"status": "failed", "error": run.status}
-        
-        # Step 3: Retrieve messages from completed thread
-        print("\n📥 Step 3: Retrieving documentation...")
+        run_options = {
+            "max_completion_tokens": max_completion_tokens,
+            "max_prompt_tokens": max_prompt_tokens,
+        }
         
-        # Get the last assistant message
-        last_message_obj = agent_client.messages.get_last_message_text_by_role(
-            thread_id=run.thread_id,
-            role="assistant"  # type: ignore
-        )
+        if stream:
+            thread = agent_client.threads.create()
+            agent_client.messages.create(thread_id=thread.id, role="user", content=user_message)  # type: ignore
+            print(f"   Thread: {thread.id}")
+            
+            # Step 3: Stream the response as it is generated
+            print("\n📡 Step 3: Streaming documentation...\n")
+            run, doc = _stream_run(agent_client, thread.id, orchestrator_id, **run_options)
+            print()
+            
+            if run is None or run.status not in USABLE_RUN_STATUSES:
+                status = run.status if run is not None else "no_run"
+                print(f"\n⚠️  Run did not complete. Status: {status}")
+                if run is not None and getattr(run, 'last_error', None):
+                    print(f"   Error: {run.last_error}")
+                return {"status": "failed", "error": status}
+            
+            runs = [run]
+            thread_id, run_id = run.thread_id, run.id
+        elif parallel_sections:
+            # Step 3: One run per section, all in flight at once
+            print(f"\n📡 Step 3: Generating {len(DOC_SECTIONS)} sections in parallel...")
+            
+            with ThreadPoolExecutor(max_workers=len(DOC_SECTIONS)) as executor:
+                futures = [
+                    executor.submit(
+                        _generate_section,
+                        agent_client,
+                        orchestrator_id,
+                        SECTION_MESSAGE_TEMPLATE.format(prompt=prompt, codebase=codebase, section=section, spec=spec),
+                        **run_options,
+                    )
+                    for section, spec in DOC_SECTIONS
+                ]
+                section_results = [future.result() for future in futures]
+            
+            runs = [run for run, _ in section_results]
+            failed = [run.status for run in runs if run.status not in USABLE_RUN_STATUSES]
+            if failed:
+                print(f"\n⚠️  {len(failed)} section run(s) did not complete. Status: {', '.join(failed)}")
+                return {"status": "failed", "error": failed[0]}
+            
+            doc = "\n\n".join(text for _, text in section_results if text)
+            thread_id = [run.thread_id for run in runs]
+            run_id = [run.id for run in runs]
+        else:
+            thread = agent_client.threads.create()
+            agent_client.messages.create(thread_id=thread.id, role="user", content=user_message)  # type: ignore
+            print(f"   Thread: {thread.id}")
+            
+            run = agent_client.runs.create(thread_id=thread.id, agent_id=orchestrator_id, **run_options)
+            print(f"   Run: {run.id}")
+            
+            run = _poll_run(agent_client, run)
+            print(f"   Status: {run.status}")
+            
+            if run.status not in USABLE_RUN_STATUSES:
+                print(f"\n⚠️  Run did not complete. Status: {run.status}")
+                if hasattr(run, 'last_error') and run.last_error:
+                    print(f"   Error: {run.last_error}")
+                return {"status": "failed", "error": run.status}
+            
+            # Step 3: Retrieve messages from completed thread
+            print("\n📥 Step 3: Retrieving documentation...")
+            doc = _last_assistant_text(agent_client, run.thread_id)
+            runs = [run]
+            thread_id, run_id = run.thread_id, run.id
         
-        if not last_message_obj:
+        if not doc:
             print("⚠️  No assistant response found")
             return {"status": "no_output"}
         
-        # Extract text - it's a MessageTextContent with .text attribute
-        if hasattr(last_message_obj, 'text'):
-            text_obj = last_message_obj.text  # type: ignore
-            doc = text_obj.value if hasattr(text_obj, 'value') else str(text_obj)
-        else:
-            doc = str(last_message_obj)
+        # Runs cut off by max_completion_tokens/max_prompt_tokens: keep the partial text
+        incomplete_details = [
+            str(getattr(run, 'incomplete_details', None) or "incomplete")
+            for run in runs if run.status == "incomplete"
+        ]
+        if incomplete_details:
+            print(f"   ⚠️  {len(incomplete_details)} run(s) stopped early: {', '.join(incomplete_details)}")
         
         print(f"   ✅ Retrieved {len(doc)} chars")
-        print(f"\n📄 Preview:\n{'-'*70}\n{doc[:300]}...\n{'-'*70}")
+        preview = doc[:500]
+        print(f"\n📄 Preview:\n{'-'*70}\n{preview[:300]}...\n{'-'*70}")
         
-        # Step 4: Render documents
+        # Step 4: Render documents, section by section
         rendered = []
         print("\n🎨 Step 4: Rendering documents...")
         try:
-            rendered = render_documents_advanced(doc, "./outputs")
-            print(f"   ✅ Rendered {len(rendered)} file(s)")
-            for f in rendered:
-                print(f"      - {f}")
+            sections = _split_sections(doc)
+            if len(sections) > 1:
+                # Section markdown is written concurrently, then the sections are
+                # converted (in worker processes when PDF output makes it worthwhile)
+                markdown_paths = _write_markdown_files(
+                    [(os.path.join(name, "docs.md"), body.encode('utf-8')) for name, body in sections],
+                    output_dir,
+                )
+                per_section = _render_sections(sections, output_dir)
+                rendered = [
+                    path
+                    for markdown_path, paths in zip(markdown_paths, per_section)
+                    for path in (markdown_path, *paths)
+                ]
+            else:
+                rendered = render_document_files(doc.encode('utf-8'), output_dir, binary=True)["files"]
+            _log(f"   ✅ Rendered {len(rendered)} file(s)", *(f"      - {f}" for f in rendered))
         except Exception as e:
             print(f"   ⚠️  Render error: {e}")
         
-        print("\n" + "=" * 70)
-        print("✅ Documentation Complete!")
-        print("=" * 70)
+        if incomplete_details:
+            _log("\n" + "=" * 70, "⚠️  Documentation Incomplete (token limit reached)", "=" * 70)
+        else:
+            _log("\n" + "=" * 70, "✅ Documentation Complete!", "=" * 70)
         
         return {
-            "status": "success",
-            "thread_id": run.thread_id,
-            "run_id": run.id,
+            "status": "incomplete" if incomplete_details else "success",
+            "incomplete_details": incomplete_details,
+            "thread_id": thread_id,
+            "run_id": run_id,
             "documentation": doc,
             "rendered_files": rendered,
-            "preview": doc[:500]
+            "preview": preview
         }
         
     except Exception as e:
-        print(f"\n❌ Error in workflow: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"\n❌ Error in workflow: {e!r}")
+        if os.getenv("DOCAGENT_DEBUG"):
+            traceback.print_exc()
         return {"status": "error", "error": str(e)}
 
 
-def run_fallback_workflow(prompt: str, codebase_path: str | None = None):
+def _analysis_as_dict(analysis) -> dict:
+    """
+    Return analyze_codebase_advanced output as a dict.
+    
+    Args:
+        analysis: Analysis JSON string (or an already decoded dict)
+        
+    Returns:
+        dict: Decoded analysis, or an empty dict if it isn't valid JSON
+    """
+    if isinstance(analysis, dict):
+        return analysis
+    try:
+        decoded = json.loads(analysis)
+    except (TypeError, ValueError):
+        return {}
+    return decoded if isinstance(decoded, dict) else {}
+
+
+def run_fallback_workflow(prompt: str, codebase_path: str | None = None, output_dir: str = "./outputs"):
     """
     Fallback workflow when Agent SDK is not available.
     Uses direct tool calls instead of agent orchestration.
     """
-    print("=" * 70)
-    print("📋 Running Fallback Workflow (Direct Tool Execution)")
-    print("=" * 70)
+    _log("=" * 70, "📋 Running Fallback Workflow (Direct Tool Execution)", "=" * 70)
     
     results = {
         "status": "success_fallback",
@@ -169,122 +781,105 @@ def run_fallback_workflow(prompt: str, codebase_path: str | None = None):
     
     try:
         # Step 1: Analyze codebase
-        if codebase_path and os.path.exists(codebase_path):
+        if codebase_path and _path_present(codebase_path):
             print(f"\n🔍 Step 1: Analyzing codebase at {codebase_path}...")
             analysis = analyze_codebase_advanced(codebase_path)
-            analysis_dict = analysis if isinstance(analysis, dict) else {}
+            analysis_dict = _analysis_as_dict(analysis)
             results["analysis"] = analysis
-            print(f"   ✅ Analysis complete: {len(analysis_dict.get('files', []))} files analyzed")
         else:
             print("\n⏩ Step 1: Skipping codebase analysis (no path provided)")
-            analysis_dict = {"files": [], "structure": {}, "security_findings": []}
+            analysis_dict = {}
+        
+        # Every lookup the template needs, done once; analyze_codebase_advanced
+        # precomputes the totals under "counts"
+        counts = analysis_dict.get('counts', {})
+        files = analysis_dict.get('files', ())
+        file_count = counts.get('files', analysis_dict.get('files_count', len(files)))
+        py_count = counts['py'] if 'py' in counts else sum(1 for f in files if f.endswith('.py'))
+        endpoint_count = counts.get('endpoints', len(analysis_dict.get('endpoints', ())))
+        findings = analysis_dict.get('security_risks', ())[:5]
+        
+        if analysis_dict:
+            print(f"   ✅ Analysis complete: {file_count} files analyzed")
         
         # Step 2: Generate documentation
         print("\n📝 Step 2: Generating documentation...")
-        documentation = f"""# Documentation Package
-
-## Project Overview
-Generated based on: {prompt}
-
-## Business Requirements Document (BRD)
-
-### Executive Summary
-This document outlines the business requirements for the system.
-
-### Stakeholders
-- Development Team
-- Product Management
-- Quality Assurance
-- Security Team
-
-### Business Objectives
-1. Deliver high-quality documentation
-2. Ensure comprehensive coverage
-3. Maintain security standards
-4. Enable efficient onboarding
-
-## Functional Requirements Document (FRD)
-
-### System Architecture
-{"Architecture based on analyzed codebase" if analysis_dict.get('files') else "Template architecture - customize based on your system"}
-
-### Core Features
-1. **Feature 1**: Description
-2. **Feature 2**: Description
-3. **Feature 3**: Description
-
-### API Endpoints
-{f"Detected {len(analysis_dict.get('api_endpoints', []))} API endpoints" if analysis_dict.get('api_endpoints') else "Define your API endpoints here"}
-
-## Non-Functional Requirements Document (NFRD)
-
-### Performance Requirements
-- Response Time: < 200ms for API calls
-- Throughput: 1000 requests/second
-- Availability: 99.9% uptime
-
-### Security Requirements
-- Authentication: OAuth 2.0 / JWT
-- Authorization: Role-Based Access Control (RBAC)
-- Encryption: TLS 1.3 for data in transit
-- Data Protection: AES-256 for data at rest
-
-{"### Security Findings" if analysis_dict.get('security_findings') else ""}
-{chr(10).join([f"- {finding}" for finding in analysis_dict.get('security_findings', [])[:5]])}
-
-### Scalability
-- Horizontal scaling capability
-- Load balancing
-- Caching strategy
-
-## Compliance & Standards
-- GDPR compliance
-- SOC 2 Type II
-- ISO 27001
-
-## Architecture Overview
-
-### Technology Stack
-{"Python: " + str(len([f for f in analysis_dict.get('files', []) if f.endswith('.py')])) + " files" if analysis_dict.get('files') else "Define your tech stack"}
-
-### Deployment Architecture
-- Cloud Platform: Azure
-- Container Orchestration: Kubernetes
-- CI/CD: GitHub Actions
-
----
-Generated by Azure AI Foundry Documentation Agent
-Date: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        
+        # Only the dynamic fields are encoded per run; the static blocks are
+        # baked at import time
+        buf = io.BytesIO()
+        buf.write(_TEMPLATE_HEAD)
+        buf.write(prompt.encode('utf-8'))
+        buf.write(_TEMPLATE_BRD_FRD)
+        buf.write(b"Architecture based on analyzed codebase" if file_count else b"Template architecture - customize based on your system")
+        buf.write(_TEMPLATE_FEATURES)
+        buf.write(f"Detected {endpoint_count} API endpoints".encode() if endpoint_count else b"Define your API endpoints here")
+        buf.write(_TEMPLATE_NFRD)
+        buf.write(b"### Security Findings\n" if findings else b"\n")
+        buf.write("\n".join(f"- {finding}" for finding in findings).encode('utf-8'))
+        buf.write(_TEMPLATE_COMPLIANCE)
+        buf.write(f"Python: {py_count} files".encode() if file_count else b"Define your tech stack")
+        buf.write(_TEMPLATE_DEPLOYMENT)
+        buf.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}\n".encode())
+        document_bytes = buf.getvalue()
+        documentation = document_bytes.decode('utf-8')
         
         results["documentation"] = documentation
         print(f"   ✅ Generated {len(documentation)} characters")
         
         # Step 3: Render documents
         print("\n🎨 Step 3: Rendering documents...")
-        output_dir = "./outputs"
-        rendered_files = render_documents_advanced(
-            markdown_content=documentation,
-            output_dir=output_dir
-        )
+        rendered_files = render_document_files(
+            markdown_content=document_bytes,
+            output_dir=output_dir,
+            binary=True
+        )["files"]
         results["rendered_files"] = rendered_files
         print(f"   ✅ Rendered {len(rendered_files)} file(s)")
         
-        print("\n" + "=" * 70)
-        print("✅ Fallback Workflow Complete!")
-        print("=" * 70)
+        _log("\n" + "=" * 70, "✅ Fallback Workflow Complete!", "=" * 70)
         
         return results
         
     except Exception as e:
-        print(f"\n❌ Error in fallback workflow: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"\n❌ Error in fallback workflow: {e!r}")
+        if os.getenv("DOCAGENT_DEBUG"):
+            traceback.print_exc()
         return {"status": "error", "error": str(e)}
 
 
+def run_docagent_batch(prompts: list[str], codebase_path: str | None = None, max_workers: int = 4):
+    """
+    Run the documentation workflow for several prompts concurrently.
+    
+    Each run spends most of its time waiting on the agent service, so runs are
+    fanned out over a thread pool and total time approaches the slowest run.
+    Every run renders into its own subdirectory of ./outputs.
+    
+    Args:
+        prompts: User requests, one workflow run per prompt
+        codebase_path: Path to the codebase shared by all runs (optional)
+        max_workers: Maximum number of concurrent runs
+        
+    Returns:
+        list: Result dicts in the same order as prompts
+    """
+    if not prompts:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+        futures = [
+            executor.submit(run_docagent_workflow, prompt, codebase_path, f"./outputs/run_{i + 1}")
+            for i, prompt in enumerate(prompts)
+        ]
+        return [future.result() for future in futures]
+
+
 def main():
     """Main entry point for the documentation agent"""
+    # Load environment variables
+    load_dotenv()
+    
     print("""
     ╔════════════════════════════════════════════════════════════════════╗
     ║        Azure AI Foundry - Documentation Agent System              ║
@@ -292,42 +887,36 @@ def main():
     ╚════════════════════════════════════════════════════════════════════╝
     """)
     
-    # Example usage scenarios
-    print("\n📚 Example Usage Scenarios:\n")
-    
-    # Scenario 1: Generate docs for a specific codebase
-    print("1️⃣  Scenario: Generate comprehensive docs for authentication API")
+    # Example usage scenarios; scenario 1: generate docs for a specific codebase
+    _log("\n📚 Example Usage Scenarios:\n", "1️⃣  Scenario: Generate comprehensive docs for authentication API")
     codebase_path = "./textdocagent"  # Example codebase
     
-    if os.path.exists(codebase_path):
+    if _path_present(codebase_path):
         prompt = "Generate comprehensive FRD, BRD, NFRD, and Security documentation for this authentication API codebase"
-        result = run_docagent_workflow(prompt, codebase_path)
+        result = run_docagent_workflow(prompt, codebase_path, stream=True)
         
-        if result.get("status") in ["success", "success_fallback"]:
-            print(f"\n✅ Success! Generated documentation:")
-            print(f"   Preview: {result.get('preview', 'N/A')[:200]}...")
+        if result.get("status") in ["success", "success_fallback", "incomplete"]:
+            _log("\n✅ Success! Generated documentation:", f"   Preview: {result.get('preview', 'N/A')[:200]}...")
             
             if result.get("rendered_files"):
-                print(f"\n📁 Output files:")
-                for file in result["rendered_files"]:
-                    print(f"   - {file}")
+                _log("\n📁 Output files:", *(f"   - {file}" for file in result["rendered_files"]))
         else:
-            print(f"\n⚠️  Status: {result.get('status')}")
-            print(f"   Error: {result.get('error', 'Unknown')}")
+            _log(f"\n⚠️  Status: {result.get('status')}", f"   Error: {result.get('error', 'Unknown')}")
     else:
-        print(f"   ⚠️  Codebase path not found: {codebase_path}")
-        print("   Generating template documentation instead...")
+        _log(f"   ⚠️  Codebase path not found: {codebase_path}", "   Generating template documentation instead...")
         prompt = "Generate template documentation structure for a REST API project"
-        result = run_docagent_workflow(prompt, None)
-    
-    print("\n" + "=" * 70)
-    print("🎉 Documentation Agent - Execution Complete!")
-    print("=" * 70)
-    print("\n💡 Tips:")
-    print("   - Check ./outputs/ directory for generated files")
-    print("   - View agents in Azure Portal: https://ai.azure.com")
-    print("   - Customize prompts for specific documentation needs")
-    print("=" * 70 + "\n")
+        result = run_docagent_workflow(prompt, None, stream=True)
+    
+    _log(
+        "\n" + "=" * 70,
+        "🎉 Documentation Agent - Execution Complete!",
+        "=" * 70,
+        "\n💡 Tips:",
+        "   - Check ./outputs/ directory for generated files",
+        "   - View agents in Azure Portal: https://ai.azure.com",
+        "   - Customize prompts for specific documentation needs",
+        "=" * 70 + "\n",
+    )
 
 
 if __name__ == "__main__":
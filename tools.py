@@ -6,14 +6,32 @@ Includes Azure Blob Storage integration for enterprise deployments
 
 import os
 import ast
+import asyncio
+import base64
+import hashlib
+import io
 import json
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
 import zipfile
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional
-from docx import Document
-import tree_sitter
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, List, Optional
+from xml.sax.saxutils import escape
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    # Only named in annotations; the grammars are imported on first use
+    import tree_sitter
+
 # Optional imports for enhanced functionality
 # Note: WeasyPrint requires GTK+ libraries on Windows, which can be difficult to install
 # We skip it on Windows and use ReportLab instead (Windows-friendly)
@@ -30,22 +48,10 @@ if sys.platform != 'win32':  # Only try WeasyPrint on non-Windows systems
 else:
     HTML = None  # type: ignore
 
-# Alternative PDF generation libraries (Windows-friendly)
-try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-
-try:
-    import pdfkit  # type: ignore
-    PDFKIT_AVAILABLE = True
-except ImportError:
-    PDFKIT_AVAILABLE = False
-    pdfkit = None  # type: ignore
+# Alternative PDF generation libraries (Windows-friendly). Only checked for here;
+# they are imported by the generator functions on first use.
+REPORTLAB_AVAILABLE = find_spec('reportlab') is not None
+PDFKIT_AVAILABLE = find_spec('pdfkit') is not None
 
 # Check if any PDF generation is available
 PDF_AVAILABLE = WEASYPRINT_AVAILABLE or REPORTLAB_AVAILABLE or PDFKIT_AVAILABLE
@@ -55,6 +61,12 @@ if not PDF_AVAILABLE:
     print("                or: pip install pdfkit + wkhtmltopdf")
     print("                or: WeasyPrint + GTK+ libraries")
 
+# Async file writes for arender; without aiofiles the writes run on threads
+AIOFILES_AVAILABLE = find_spec('aiofiles') is not None
+
+# Pandoc gives full-fidelity DOCX output in one native call when installed
+PANDOC_AVAILABLE = shutil.which('pandoc') is not None
+
 try:
     from azure.storage.blob import BlobServiceClient
     AZURE_BLOB_AVAILABLE = True
@@ -71,12 +83,12 @@ except ImportError:
     markdown2 = None  # type: ignore
     print("⚠️  markdown2 not available. Using basic markdown conversion.")
 
-try:
-    import tree_sitter_python
-    import tree_sitter_javascript
-    TREE_SITTER_LANGUAGES_AVAILABLE = True
-except ImportError:
-    TREE_SITTER_LANGUAGES_AVAILABLE = False
+# Grammars are loaded on first use by _get_tree_sitter_language
+TREE_SITTER_LANGUAGES_AVAILABLE = all(
+    find_spec(name) is not None
+    for name in ('tree_sitter', 'tree_sitter_python', 'tree_sitter_javascript')
+)
+if not TREE_SITTER_LANGUAGES_AVAILABLE:
     print("⚠️  tree-sitter language bindings not available. Advanced parsing disabled.")
 
 # Load environment variables
@@ -269,6 +281,426 @@ def analyze_codebase(project_path: str) -> Dict:
     return analysis
 
 
+# Source file extensions picked up by the advanced analyzer
+SRC_EXTS = ('.py', '.js', '.ts', '.java', '.go', '.cs')
+
+# Vendored, VCS and build directories that never hold project sources
+SKIP_DIRS = {'node_modules', '.git', '__pycache__', 'dist', 'build', '.venv', 'venv', 'target'}
+
+# Larger source files are almost always generated or minified; they are counted
+# but not scanned
+MAX_SCAN_BYTES = 2 * 1024 * 1024
+
+# Per-file scanning is I/O-bound, so oversubscribe the CPU count
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Every keyword probe of the scanner folded into one case-insensitive pass.
+# Longer keywords are listed before the shorter ones they contain.
+# Patterns are bytes so files are scanned as read, without decoding or lowercasing.
+KEYWORD_PATTERN = (
+    rb'fastapi|flask|@app\.route|router\.|express'
+    rb'|route|get\(|post\(|put\(|delete\('
+    rb'|jwt|oauth|passport|auth0|authentication'
+    rb'|password|api_key'
+)
+# Captured inside a lookahead so matches can overlap, like the substring checks
+# they replace: 'fastapi_key' must yield both 'fastapi' and 'api_key'
+KEYWORD_RE = re.compile(rb'(?=(' + KEYWORD_PATTERN + rb'))', re.IGNORECASE)
+WEB_FRAMEWORK_HINTS = {b'fastapi', b'flask', b'@app.route', b'router.'}
+# 'router.' claims its position ahead of the 'route' it starts with, so it counts too
+ENDPOINT_HINTS = {b'route', b'@app.route', b'router.', b'get(', b'post(', b'put(', b'delete('}
+AUTH_HINTS = {b'jwt', b'oauth', b'passport', b'auth0', b'authentication'}
+# Matches that make their line an endpoint line (any 'route', 'get(' or 'post(')
+ENDPOINT_LINE_HINTS = {b'route', b'@app.route', b'router.', b'get(', b'post('}
+
+# Large folders are scanned by ripgrep when it is installed; below this many
+# source files the in-process scanner is just as fast
+RIPGREP_PATH = shutil.which('rg')
+RIPGREP_MIN_FILES = 500
+
+# Framework-specific labels and the language family they refine
+LANGUAGE_FAMILY = {
+    "Python Web": "Python",
+    "Node.js Express": "JavaScript/TypeScript",
+}
+
+
+# Tree-sitter grammar per file extension
+TREE_SITTER_GRAMMARS = {'.py': 'python', '.js': 'javascript', '.ts': 'javascript'}
+
+# Parsers are not thread-safe, so each scanner thread keeps its own set
+_tree_sitter_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _get_tree_sitter_language(grammar: str) -> "tree_sitter.Language":
+    """Load a tree-sitter grammar once per process"""
+    import tree_sitter
+    if grammar == 'python':
+        import tree_sitter_python as tspython
+        return tree_sitter.Language(tspython.language())
+    import tree_sitter_javascript as tsjs
+    return tree_sitter.Language(tsjs.language())
+
+
+def _get_tree_sitter_parser(file: str) -> Optional["tree_sitter.Parser"]:
+    """Return the calling thread's cached parser for file, or None if unsupported"""
+    grammar = TREE_SITTER_GRAMMARS.get(os.path.splitext(file)[1])
+    if grammar is None:
+        return None
+    parsers = getattr(_tree_sitter_local, 'parsers', None)
+    if parsers is None:
+        parsers = _tree_sitter_local.parsers = {}
+    parser = parsers.get(grammar)
+    if parser is None:
+        import tree_sitter
+        parser = parsers[grammar] = tree_sitter.Parser(_get_tree_sitter_language(grammar))
+    return parser
+
+
+def _worth_reading(size: int) -> bool:
+    """Skip empty files and oversized (almost always generated/minified) ones"""
+    return 0 < size <= MAX_SCAN_BYTES
+
+
+def _zip_sources(z: zipfile.ZipFile, file_path: str):
+    """
+    Yield (file name, display path, reader) for every source member of an open archive.
+    
+    Members are read straight into memory instead of being extracted to disk and
+    walked again. Empty and oversized members are counted but never read.
+    """
+    for info in z.infolist():
+        if info.is_dir() or not info.filename.endswith(SRC_EXTS):
+            continue
+        *dirs, name = info.filename.split('/')
+        if SKIP_DIRS.intersection(dirs):
+            continue
+        display_path = f"{file_path}!{info.filename}"
+        if not _worth_reading(info.file_size):
+            yield name, display_path, lambda: b''
+            continue
+        # ZipFile.read returns the member in one call, without a stream wrapper
+        yield name, display_path, lambda info=info: z.read(info)
+
+
+def _walk_source_entries(file_path: str):
+    """
+    Yield a DirEntry for every source file in a directory tree.
+    
+    Walks with os.scandir so entry types come from the directory listing, and
+    prunes vendored/build directories (SKIP_DIRS) before descending into them.
+    """
+    pending = [file_path]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError as e:
+            print(f"⚠️  Could not read directory: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        pending.append(entry.path)
+                elif entry.name.endswith(SRC_EXTS) and entry.is_file():
+                    yield entry
+
+
+def _dir_sources(entries):
+    """Yield (file name, path, reader) for source file entries from _walk_source_entries"""
+    for entry in entries:
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            size = 0
+        if not _worth_reading(size):
+            yield entry.name, entry.path, lambda: b''
+            continue
+        
+        def read_file(full_path=entry.path):
+            with open(full_path, 'rb') as f:
+                return f.read()
+        
+        yield entry.name, entry.path, read_file
+
+
+def _detect_language(file: str, hits: set) -> str:
+    """Detect a file's language from its extension and keyword hits"""
+    if file.endswith('.py'):
+        return "Python Web" if hits & WEB_FRAMEWORK_HINTS else "Python"
+    if file.endswith(('.js', '.ts')):
+        return "Node.js Express" if b'express' in hits else "JavaScript/TypeScript"
+    if file.endswith('.java'):
+        return "Java"
+    if file.endswith('.go'):
+        return "Go"
+    if file.endswith('.cs'):
+        return "C#"
+    return "unknown"
+
+
+def _security_risks(file: str, hits: set, data: bytes) -> List[str]:
+    """Flag likely hardcoded credentials from keyword hits and the file bytes"""
+    risks = []
+    if b'password' in hits and b'=' in data:
+        risks.append(f"Possible hardcoded credential in {file}")
+    if b'api_key' in hits and (b'=' in data or b'"' in data):
+        risks.append(f"Possible hardcoded API key in {file}")
+    return risks
+
+
+def _scan_file(file: str, full_path: str, read_content) -> Dict:
+    """
+    Scan a single source file for language, endpoints, auth and security hints.
+    
+    Args:
+        file: File name, used for language detection and findings
+        full_path: Path shown in error messages
+        read_content: Callable returning the raw file bytes
+        
+    Returns:
+        Dictionary with language, endpoints, auth and security_risks keys
+    """
+    scan = {
+        "language": "unknown",
+        "endpoints": [],
+        "auth": False,
+        "security_risks": []
+    }
+    
+    try:
+        data = read_content()
+    except (OSError, zipfile.BadZipFile, zlib.error, RuntimeError, NotImplementedError, EOFError) as e:
+        # Unreadable file or bad archive member (corrupt, encrypted, unsupported
+        # compression or truncated); anything else is a bug and propagates
+        print(f"⚠️  Error analyzing {full_path}: {e}")
+        return scan
+    
+    # One pass over the bytes collects the keyword hits and the first few
+    # endpoint lines, sliced out around each match
+    raw_hits = set()
+    endpoints = []
+    line_end = -1
+    for match in KEYWORD_RE.finditer(data):
+        token = match.group(1)
+        raw_hits.add(token)
+        start = match.start()
+        if len(endpoints) < 5 and start > line_end and token.lower() in ENDPOINT_LINE_HINTS:
+            line_start = data.rfind(b'\n', 0, start) + 1
+            line_end = data.find(b'\n', start)
+            if line_end == -1:
+                line_end = len(data)
+            endpoints.append(data[line_start:line_end].strip().decode('utf-8', 'ignore'))
+    # Case-fold only the distinct spellings found, not every occurrence
+    hits = {hit.lower() for hit in raw_hits}
+    
+    scan["language"] = _detect_language(file, hits)
+    
+    # Detect endpoints
+    if hits & ENDPOINT_HINTS:
+        scan["endpoints"] = endpoints  # Limited to 5 per file
+    
+    # Detect authentication
+    if hits & AUTH_HINTS:
+        scan["auth"] = True
+    
+    # Security analysis
+    scan["security_risks"] = _security_risks(file, hits, data)
+    
+    # Advanced parsing with tree-sitter if available
+    if TREE_SITTER_LANGUAGES_AVAILABLE:
+        try:
+            parser = _get_tree_sitter_parser(file)
+            if parser is not None:
+                tree = parser.parse(data)
+                # Additional AST analysis can be added here
+        except Exception as e:
+            print(f"⚠️  Tree-sitter parsing failed for {file}: {e}")
+    
+    return scan
+
+
+def _scan_sources(sources) -> List[Dict]:
+    """Run _scan_file over all sources in a thread pool, preserving order"""
+    sources = list(sources)
+    if not sources:
+        return []
+    with ThreadPoolExecutor(max_workers=min(SCAN_WORKERS, len(sources))) as executor:
+        return list(executor.map(lambda source: _scan_file(*source), sources))
+
+
+def _ripgrep_text(value: Dict) -> bytes:
+    """Decode a ripgrep JSON text field, which is base64 'bytes' when not valid UTF-8"""
+    if 'text' in value:
+        return value['text'].encode('utf-8')
+    return base64.b64decode(value['bytes'])
+
+
+def _scan_with_ripgrep(file_path: str, entries) -> Optional[List[Dict]]:
+    """
+    Scan a folder with a single ripgrep run instead of opening every file in Python.
+    
+    ripgrep reports every line containing a keyword, which is all the scanner
+    needs except the file-wide '='/'"' check behind credential findings; only
+    files with a password/api_key hit are read back for that. Tree-sitter
+    parsing is skipped on this path.
+    
+    Args:
+        file_path: Folder to scan
+        entries: Source file entries from _walk_source_entries, in result order
+        
+    Returns:
+        One scan dict per entry, or None if ripgrep failed (caller falls back)
+    """
+    # --text/--encoding none: search raw bytes like _scan_file, instead of skipping
+    # files with NUL bytes as binary or transcoding ones with a UTF-16 BOM
+    command = [RIPGREP_PATH, '--json', '--ignore-case', '--no-config', '--no-ignore', '--hidden',
+               '--no-messages', '--text', '--encoding', 'none', '--max-filesize', str(MAX_SCAN_BYTES),
+               '-e', KEYWORD_PATTERN.decode('ascii')]
+    for ext in SRC_EXTS:
+        command += ['-g', f'*{ext}']
+    for skip_dir in SKIP_DIRS:
+        command += ['-g', f'!{skip_dir}']
+    # "--" ends option parsing: a path starting with "-" (the tool takes
+    # agent-supplied paths) must not be read as an rg flag such as --pre
+    command += ['--', file_path]
+    
+    try:
+        completed = subprocess.run(command, capture_output=True, check=False)
+    except OSError as e:
+        print(f"⚠️  ripgrep failed, scanning in Python: {e}")
+        return None
+    # Exit code 1 just means nothing matched
+    if completed.returncode not in (0, 1):
+        print(f"⚠️  ripgrep failed (exit {completed.returncode}), scanning in Python")
+        return None
+    
+    matches = {}
+    for raw_event in completed.stdout.splitlines():
+        event = json.loads(raw_event)
+        if event.get('type') != 'match':
+            continue
+        data = event['data']
+        path = os.path.normpath(os.fsdecode(_ripgrep_text(data['path'])))
+        hits, lines = matches.setdefault(path, (set(), []))
+        # rg's submatches don't overlap, so the reported line is re-probed for every keyword
+        line = _ripgrep_text(data['lines'])
+        line_hits = {match.group(1).lower() for match in KEYWORD_RE.finditer(line)}
+        hits.update(line_hits)
+        lines.append((line, line_hits))
+    
+    scans = []
+    for entry in entries:
+        hits, lines = matches.get(os.path.normpath(entry.path), (set(), []))
+        scan = {
+            "language": _detect_language(entry.name, hits),
+            "endpoints": [],
+            "auth": bool(hits & AUTH_HINTS),
+            "security_risks": []
+        }
+        if hits & ENDPOINT_HINTS:
+            endpoints = [line.strip().decode('utf-8', 'ignore') for line, line_hits in lines
+                         if line_hits & ENDPOINT_LINE_HINTS]
+            scan["endpoints"] = endpoints[:5]  # Limit to 5 per file
+        if b'password' in hits or b'api_key' in hits:
+            try:
+                with open(entry.path, 'rb') as f:
+                    scan["security_risks"] = _security_risks(entry.name, hits, f.read())
+            except OSError as e:
+                print(f"⚠️  Error analyzing {entry.path}: {e}")
+        scans.append(scan)
+    return scans
+
+
+def _scan_codebase(file_path: str, archive: Optional[io.BytesIO] = None) -> List[Dict]:
+    """Scan every source file of a folder or .zip archive (on disk or in memory)"""
+    if archive is not None or file_path.endswith('.zip'):
+        # Keep the archive open until every worker has read its member
+        with zipfile.ZipFile(archive or file_path, 'r') as z:
+            return _scan_sources(_zip_sources(z, file_path))
+    
+    entries = list(_walk_source_entries(file_path))
+    if RIPGREP_PATH and len(entries) >= RIPGREP_MIN_FILES:
+        scans = _scan_with_ripgrep(file_path, entries)
+        if scans is not None:
+            return scans
+    return _scan_sources(_dir_sources(entries))
+
+
+# Analysis JSON keyed by _analysis_cache_key, so repeated runs on an unchanged
+# codebase skip the scan entirely. Least recently used entries are evicted past
+# ANALYSIS_CACHE_SIZE; the lock covers concurrent batch runs.
+ANALYSIS_CACHE_SIZE = 32
+_ANALYSIS_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_ANALYSIS_CACHE_LOCK = threading.Lock()
+
+
+def _cached_analysis(cache_key: tuple) -> Optional[str]:
+    """Return the cached analysis JSON for cache_key, marking it recently used"""
+    with _ANALYSIS_CACHE_LOCK:
+        analysis_json = _ANALYSIS_CACHE.get(cache_key)
+        if analysis_json is not None:
+            _ANALYSIS_CACHE.move_to_end(cache_key)
+        return analysis_json
+
+
+def _cache_analysis(cache_key: tuple, analysis_json: str):
+    """Store analysis JSON, evicting the least recently used entries"""
+    with _ANALYSIS_CACHE_LOCK:
+        _ANALYSIS_CACHE[cache_key] = analysis_json
+        _ANALYSIS_CACHE.move_to_end(cache_key)
+        while len(_ANALYSIS_CACHE) > ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+
+
+def _analysis_cache_key(file_path: str) -> Optional[tuple]:
+    """
+    Build a cheap change-detection key for a codebase without reading file contents.
+    
+    Archives are keyed on size and mtime; folders on a digest of every source
+    file's relative path, size and mtime, so edits, additions, deletions and
+    renames/moves all change the key. Returns None if the path cannot be stat'ed.
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    path = os.path.abspath(file_path)
+    if file_path.endswith('.zip'):
+        return (path, st.st_size, st.st_mtime_ns)
+    
+    fingerprints = []
+    for entry in _walk_source_entries(file_path):
+        try:
+            entry_st = entry.stat()
+        except OSError:
+            continue
+        rel_path = os.path.relpath(entry.path, file_path)
+        fingerprints.append(f"{rel_path}\0{entry_st.st_size}\0{entry_st.st_mtime_ns}")
+    
+    digest = hashlib.blake2b(digest_size=16)
+    for fingerprint in sorted(fingerprints):
+        digest.update(fingerprint.encode('utf-8', 'surrogateescape'))
+        digest.update(b'\n')
+    return (path, len(fingerprints), digest.hexdigest())
+
+
+def _pick_language(languages: List[str]) -> str:
+    """
+    Pick the codebase language from per-file detections.
+    
+    The most common language family wins (instead of whichever file was scanned
+    last); a framework detected in that family, e.g. "Python Web", labels it.
+    """
+    counts = Counter(LANGUAGE_FAMILY.get(lang, lang) for lang in languages if lang != "unknown")
+    if not counts:
+        return "unknown"
+    family = counts.most_common(1)[0][0]
+    framework = next((lang for lang in languages if LANGUAGE_FAMILY.get(lang) == family), None)
+    return framework or family
+
+
 def analyze_codebase_advanced(file_path: str, container: str = "code-inputs") -> str:
     """
     Advanced codebase analysis with Tree-sitter and Azure Blob Storage support.
@@ -281,110 +713,241 @@ def analyze_codebase_advanced(file_path: str, container: str = "code-inputs") ->
     Returns:
         JSON string containing analysis results
     """
-    result = {
-        "files_count": 0,
-        "language": "unknown",
-        "endpoints": [],
-        "auth_methods": [],
-        "security_risks": [],
-        "architecture_summary": ""
-    }
-    
-    # Download from Blob if configured and file doesn't exist locally
+    # Download from Blob if configured and file doesn't exist locally.
+    # Downloaded codebases are never cached: they have no stable local identity.
     if blob_service_client and not os.path.exists(file_path):
         try:
             blob_client = blob_service_client.get_blob_client(container, file_path)
-            with open(f"/tmp/{os.path.basename(file_path)}", "wb") as f:
-                f.write(blob_client.download_blob().readall())
-            file_path = f"/tmp/{os.path.basename(file_path)}"
+            blob_bytes = blob_client.download_blob().readall()
         except Exception as e:
             print(f"⚠️  Could not download from Blob: {e}")
+        else:
+            if file_path.endswith('.zip'):
+                # Open the archive straight from memory; nothing is written to disk
+                return _analyze_codebase(file_path, use_cache=False, archive=io.BytesIO(blob_bytes))
+            # Each call gets its own temp directory, so concurrent runs never share files
+            with tempfile.TemporaryDirectory(prefix='docagent_') as download_dir:
+                local_path = os.path.join(download_dir, os.path.basename(file_path))
+                Path(local_path).write_bytes(blob_bytes)
+                return _analyze_codebase(local_path, use_cache=False)
     
-    # Extract zip if needed
-    if file_path.endswith('.zip'):
-        extract_dir = '/tmp/codebase' if os.name != 'nt' else 'C:/temp/codebase'
-        with zipfile.ZipFile(file_path, 'r') as z:
-            z.extractall(extract_dir)
-        file_path = extract_dir
-    
-    # Analyze files
-    for root, _, files in os.walk(file_path):
-        for file in files:
-            if file.endswith(('.py', '.js', '.ts', '.java', '.go', '.cs')):
-                result["files_count"] += 1
-                full_path = os.path.join(root, file)
-                
-                try:
-                    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        content_lower = content.lower()
-                        
-                        # Detect language
-                        if file.endswith('.py'):
-                            result["language"] = "Python"
-                            if any(x in content_lower for x in ['fastapi', 'flask', '@app.route', 'router.']):
-                                result["language"] = "Python Web"
-                        elif file.endswith(('.js', '.ts')):
-                            result["language"] = "JavaScript/TypeScript"
-                            if 'express' in content_lower:
-                                result["language"] = "Node.js Express"
-                        elif file.endswith('.java'):
-                            result["language"] = "Java"
-                        elif file.endswith('.go'):
-                            result["language"] = "Go"
-                        elif file.endswith('.cs'):
-                            result["language"] = "C#"
-                        
-                        # Detect endpoints
-                        if any(x in content_lower for x in ['route', 'get(', 'post(', 'put(', 'delete(']):
-                            endpoints = [line.strip() for line in content.split('\n') 
-                                       if any(x in line.lower() for x in ['route', 'get(', 'post('])]
-                            result["endpoints"].extend(endpoints[:5])  # Limit to 5 per file
-                        
-                        # Detect authentication
-                        if any(x in content_lower for x in ['jwt', 'oauth', 'passport', 'auth0', 'authentication']):
-                            if "JWT/OAuth" not in result["auth_methods"]:
-                                result["auth_methods"].append("JWT/OAuth detected")
-                        
-                        # Security analysis
-                        if 'password' in content_lower and '=' in content:
-                            result["security_risks"].append(f"Possible hardcoded credential in {file}")
-                        if 'api_key' in content_lower and ('=' in content or '"' in content):
-                            result["security_risks"].append(f"Possible hardcoded API key in {file}")
-                        
-                        # Advanced parsing with tree-sitter if available
-                        if TREE_SITTER_LANGUAGES_AVAILABLE:
-                            try:
-                                if file.endswith('.py'):
-                                    import tree_sitter_python as tspython
-                                    PY_LANGUAGE = tree_sitter.Language(tspython.language())
-                                    parser = tree_sitter.Parser(PY_LANGUAGE)
-                                    tree = parser.parse(content.encode())
-                                    # Additional AST analysis can be added here
-                                elif file.endswith(('.js', '.ts')):
-                                    import tree_sitter_javascript as tsjs
-                                    JS_LANGUAGE = tree_sitter.Language(tsjs.language())
-                                    parser = tree_sitter.Parser(JS_LANGUAGE)
-                                    tree = parser.parse(content.encode())
-                                    # Additional AST analysis can be added here
-                            except Exception as e:
-                                print(f"⚠️  Tree-sitter parsing failed for {file}: {e}")
-                                
-                except Exception as e:
-                    print(f"⚠️  Error analyzing {full_path}: {e}")
-    
-    result["architecture_summary"] = f"{result['files_count']} files analyzed; {len(result['endpoints'])} endpoints detected; {len(result['security_risks'])} security concerns."
-    
-    # Upload summary to Blob if configured
+    return _analyze_codebase(file_path)
+
+
+def _upload_analysis_summary(analysis_json: str):
+    """Upload the analysis summary to Blob if configured"""
     if blob_service_client:
         try:
             blob_client = blob_service_client.get_blob_client("analysis-output", "summary.json")
-            blob_client.upload_blob(json.dumps(result, indent=2), overwrite=True)
+            blob_client.upload_blob(analysis_json, overwrite=True)
             print("✅ Analysis uploaded to Azure Blob Storage")
         except Exception as e:
             print(f"⚠️  Could not upload to Blob: {e}")
+
+
+def _analyze_codebase(file_path: str, use_cache: bool = True, archive: Optional[io.BytesIO] = None) -> str:
+    """
+    Analyze a folder or .zip and return the analysis JSON.
+    If archive is given, it holds the zip named by file_path already in memory.
+    """
+    result = {
+        "files_count": 0,
+        "language": "unknown",
+        "endpoints": [],
+        "auth_methods": [],
+        "security_risks": [],
+        "architecture_summary": "",
+        "counts": {}
+    }
+    
+    cache_key = _analysis_cache_key(file_path) if use_cache else None
+    if cache_key is not None:
+        cached = _cached_analysis(cache_key)
+        if cached is not None:
+            print(f"✅ Reusing cached analysis for {file_path}")
+            # The blob may have been overwritten by another analysis meanwhile
+            _upload_analysis_summary(cached)
+            return cached
+    
+    # Analyze files (zip members are read straight from the archive, no extraction)
+    scans = _scan_codebase(file_path, archive)
+    result["files_count"] = len(scans)
+    result["language"] = _pick_language([scan["language"] for scan in scans])
+    result["endpoints"] = list(chain.from_iterable(scan["endpoints"] for scan in scans))
+    if any(scan["auth"] for scan in scans):
+        result["auth_methods"].append("JWT/OAuth detected")
+    result["security_risks"] = list(chain.from_iterable(scan["security_risks"] for scan in scans))
+    # Precomputed totals, so consumers don't rescan the lists above
+    result["counts"] = {
+        "files": result["files_count"],
+        "py": sum(1 for scan in scans if LANGUAGE_FAMILY.get(scan["language"], scan["language"]) == "Python"),
+        "endpoints": len(result["endpoints"]),
+        "security_risks": len(result["security_risks"]),
+    }
     
-    return json.dumps(result, indent=2)
+    result["architecture_summary"] = f"{result['files_count']} files analyzed; {len(result['endpoints'])} endpoints detected; {len(result['security_risks'])} security concerns."
+    
+    analysis_json = json.dumps(result, indent=2)
+    _upload_analysis_summary(analysis_json)
+    if cache_key is not None:
+        _cache_analysis(cache_key, analysis_json)
+    return analysis_json
+
+# Rendered outputs are written in one buffered call rather than many small writes
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Markdown heading levels mapped onto DOCX headings
+HEADING_RE = re.compile(r'^(#{1,4}) (.*)$')
+
+# Characters XML 1.0 cannot carry; Word refuses documents containing them
+XML_INVALID_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Minimal WordprocessingML package: every part except word/document.xml is static
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_DOCX_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles xmlns:w="{_W_NS}">'
+    '<w:docDefaults>'
+    '<w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+    '<w:sz w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="160" w:line="259" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/>'
+    '<w:basedOn w:val="Normal"/><w:next w:val="Normal"/>'
+    '<w:rPr><w:color w:val="17365D"/><w:sz w:val="52"/></w:rPr></w:style>'
+    + ''.join(
+        f'<w:style w:type="paragraph" w:styleId="Heading{level}"><w:name w:val="heading {level}"/>'
+        '<w:basedOn w:val="Normal"/><w:next w:val="Normal"/>'
+        f'<w:pPr><w:keepNext/><w:spacing w:before="240" w:after="80"/><w:outlineLvl w:val="{level - 1}"/></w:pPr>'
+        f'<w:rPr><w:b/><w:color w:val="365F91"/><w:sz w:val="{size}"/></w:rPr></w:style>'
+        for level, size in ((1, 32), (2, 28), (3, 24), (4, 22))
+    )
+    + '<w:style w:type="paragraph" w:styleId="ListBullet"><w:name w:val="List Bullet"/>'
+    '<w:basedOn w:val="Normal"/><w:pPr><w:ind w:left="360" w:hanging="360"/></w:pPr></w:style>'
+    '</w:styles>'
+)
+_DOCX_SECTION = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr>'
+)
+
+
+def _docx_paragraph(lines: List[str], style: Optional[str] = None) -> str:
+    """Render lines as one WordprocessingML paragraph, joined by line breaks"""
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    text_xml = '<w:br/>'.join(
+        f'<w:t xml:space="preserve">{escape(XML_INVALID_CHARS_RE.sub("", line))}</w:t>'
+        for line in lines
+    )
+    return f'<w:p>{style_xml}<w:r>{text_xml}</w:r></w:p>'
+
+
+def _markdown_to_document_xml(markdown_content: str, title: str) -> str:
+    """
+    Build word/document.xml for markdown content in a single string join.
+    
+    Consecutive text lines are collected into one paragraph (one run with line
+    breaks) and emitted when a heading, bullet, code fence or blank line ends
+    the block, instead of one paragraph per line.
+    """
+    parts = [_docx_paragraph([title], 'Title')]
+    block = []
+    
+    def flush():
+        if block:
+            parts.append(_docx_paragraph(block))
+            block.clear()
+    
+    for line in markdown_content.split('\n'):
+        line = line.strip()
+        heading = HEADING_RE.match(line)
+        if heading:
+            flush()
+            parts.append(_docx_paragraph([heading.group(2)], f'Heading{len(heading.group(1))}'))
+        elif line.startswith('- ') or line.startswith('* '):
+            flush()
+            parts.append(_docx_paragraph([f'• {line[2:]}'], 'ListBullet'))
+        elif line.startswith('```') or not line:
+            # Code fence markers and blank lines only end the current block
+            flush()
+        else:
+            block.append(line)
+    flush()
+    
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}"><w:body>'
+        + ''.join(parts)
+        + _DOCX_SECTION
+        + '</w:body></w:document>'
+    )
+
+
+def _write_docx(markdown_content: str, output_path: str, title: str):
+    """Write a .docx package directly as zipped XML, without an object model"""
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        docx.writestr('_rels/.rels', _DOCX_PACKAGE_RELS)
+        docx.writestr('word/_rels/document.xml.rels', _DOCX_DOCUMENT_RELS)
+        docx.writestr('word/styles.xml', _DOCX_STYLES)
+        docx.writestr('word/document.xml', _markdown_to_document_xml(markdown_content, title))
+
+
+async def _write_one(path: str, data: bytes):
+    """Write one rendered file without blocking the event loop"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if AIOFILES_AVAILABLE:
+        import aiofiles  # type: ignore
+        async with aiofiles.open(path, 'wb') as f:
+            await f.write(data)
+    else:
+        await asyncio.to_thread(Path(path).write_bytes, data)
+
+
+async def arender(docs: List[tuple], out_dir: str) -> List[str]:
+    """
+    Write several rendered files concurrently.
+    
+    Args:
+        docs: (relative path, bytes) pairs to write under out_dir
+        out_dir: Output directory
+        
+    Returns:
+        List of written paths, in the order of docs
+    """
+    paths = [os.path.join(out_dir, name) for name, _ in docs]
+    await asyncio.gather(*(_write_one(path, data) for path, (_, data) in zip(paths, docs)))
+    return paths
+
 
 def render_documentation(content: str, output_dir: str) -> str:
     """
@@ -401,8 +964,7 @@ def render_documentation(content: str, output_dir: str) -> str:
     
     # Save as Markdown
     md_path = os.path.join(output_dir, "documentation.md")
-    with open(md_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    Path(md_path).write_bytes(content.encode('utf-8'))
     
     # Save as HTML
     html_path = os.path.join(output_dir, "documentation.html")
@@ -431,7 +993,12 @@ def render_documentation(content: str, output_dir: str) -> str:
     return md_path
 
 
-def render_documents_advanced(markdown_content: str, output_dir: str = "outputs") -> str:
+def render_documents_advanced(
+    markdown_content: str | bytes,
+    output_dir: str = "outputs",
+    binary: bool = False,
+    blob_prefix: str = "",
+) -> str:
     """
     Advanced document rendering with Azure Blob Storage upload support.
     Renders markdown to PDF/DOCX and uploads to Blob if configured.
@@ -439,17 +1006,58 @@ def render_documents_advanced(markdown_content: str, output_dir: str = "outputs"
     Args:
         markdown_content: Markdown documentation content
         output_dir: Directory to save output files
+        binary: markdown_content is UTF-8 encoded bytes; they are also saved
+            as docs.md with a single buffered write
+        blob_prefix: Prefix for the uploaded blob names, so separately
+            rendered documents don't overwrite each other
         
     Returns:
         Status message with file paths
     """
+    rendered = render_document_files(markdown_content, output_dir, binary, blob_prefix)
+    
+    result = f"Rendered documents saved to {output_dir}/"
+    for path in rendered["files"]:
+        result += f"\n  - {os.path.basename(path)}"
+    if rendered["uploaded"]:
+        result += f"\n  - Uploaded to cloud: {', '.join(rendered['uploaded'])}"
+    
+    return result
+
+
+def render_document_files(
+    markdown_content: str | bytes,
+    output_dir: str = "outputs",
+    binary: bool = False,
+    blob_prefix: str = "",
+) -> Dict[str, List[str]]:
+    """
+    Render markdown like render_documents_advanced, reporting what was produced.
+    
+    Args:
+        markdown_content: Markdown documentation content
+        output_dir: Directory to save output files
+        binary: markdown_content is UTF-8 encoded bytes, also saved as docs.md
+        blob_prefix: Prefix for the uploaded blob names
+        
+    Returns:
+        Dict with "files" (paths written by this call) and "uploaded" (blob names)
+    """
     os.makedirs(output_dir, exist_ok=True)
     
+    md_path = None
+    if binary:
+        md_path = os.path.join(output_dir, "docs.md")
+        with open(md_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(markdown_content)
+        markdown_content = markdown_content.decode('utf-8')
+    
     # Convert markdown to HTML
     if MARKDOWN2_AVAILABLE and markdown2 is not None:
         html = markdown2.markdown(markdown_content, extras=['fenced-code-blocks', 'tables'])
     else:
         # Fallback to basic conversion
+        html_body = markdown_content.replace('\n', '<br>')
         html = f"""
         <!DOCTYPE html>
         <html>
@@ -497,7 +1105,7 @@ def render_documents_advanced(markdown_content: str, output_dir: str = "outputs"
             </style>
         </head>
         <body>
-            {markdown_content.replace('\n', '<br>')}
+            {html_body}
         </body>
         </html>
         """
@@ -517,29 +1125,7 @@ def render_documents_advanced(markdown_content: str, output_dir: str = "outputs"
     # Generate DOCX
     docx_path = os.path.join(output_dir, "docs.docx")
     try:
-        doc = Document()
-        doc.add_heading('Documentation Package', 0)
-        
-        # Parse markdown content
-        for line in markdown_content.split('\n'):
-            line = line.strip()
-            if line.startswith('# '):
-                doc.add_heading(line[2:], level=1)
-            elif line.startswith('## '):
-                doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                doc.add_heading(line[4:], level=3)
-            elif line.startswith('#### '):
-                doc.add_heading(line[5:], level=4)
-            elif line.startswith('- ') or line.startswith('* '):
-                doc.add_paragraph(line[2:], style='List Bullet')
-            elif line.startswith('```'):
-                # Skip code fence markers
-                continue
-            elif line:
-                doc.add_paragraph(line)
-        
-        doc.save(docx_path)
+        create_docx(markdown_content, docx_path, title='Documentation Package')
         print(f"✅ DOCX rendered: {docx_path}")
     except Exception as e:
         print(f"⚠️  DOCX generation failed: {e}")
@@ -551,34 +1137,30 @@ def render_documents_advanced(markdown_content: str, output_dir: str = "outputs"
         try:
             if pdf_path and os.path.exists(pdf_path):
                 with open(pdf_path, "rb") as f:
-                    blob_client = blob_service_client.get_blob_client("doc-outputs", "docs.pdf")
+                    blob_client = blob_service_client.get_blob_client("doc-outputs", f"{blob_prefix}docs.pdf")
                     blob_client.upload_blob(f, overwrite=True)
-                    uploaded_files.append("docs.pdf")
+                    uploaded_files.append(f"{blob_prefix}docs.pdf")
             
             if docx_path and os.path.exists(docx_path):
                 with open(docx_path, "rb") as f:
-                    blob_client = blob_service_client.get_blob_client("doc-outputs", "docs.docx")
+                    blob_client = blob_service_client.get_blob_client("doc-outputs", f"{blob_prefix}docs.docx")
                     blob_client.upload_blob(f, overwrite=True)
-                    uploaded_files.append("docs.docx")
+                    uploaded_files.append(f"{blob_prefix}docs.docx")
             
             if uploaded_files:
                 print(f"✅ Uploaded to Azure Blob Storage: {', '.join(uploaded_files)}")
         except Exception as e:
             print(f"⚠️  Could not upload to Blob: {e}")
     
-    result = f"Rendered documents saved to {output_dir}/"
-    if pdf_path:
-        result += f"\n  - docs.pdf"
-    if docx_path:
-        result += f"\n  - docs.docx"
-    if uploaded_files:
-        result += f"\n  - Uploaded to cloud: {', '.join(uploaded_files)}"
-    
-    return result
+    return {
+        "files": [path for path in (md_path, pdf_path, docx_path) if path],
+        "uploaded": uploaded_files,
+    }
 
 def markdown_to_html(markdown_content: str) -> str:
     """Convert markdown to HTML"""
     # Simple conversion - consider using markdown library for production
+    html_body = markdown_content.replace('\n', '<br>')
     html = f"""
     <!DOCTYPE html>
     <html>
@@ -609,29 +1191,33 @@ def markdown_to_html(markdown_content: str) -> str:
         </style>
     </head>
     <body>
-        <div>{markdown_content.replace('\n', '<br>')}</div>
+        <div>{html_body}</div>
     </body>
     </html>
     """
     return html
 
-def create_docx(content: str, output_path: str):
-    """Create a DOCX document from content"""
-    doc = Document()
-    doc.add_heading('Project Documentation', 0)
-    
-    # Split content by lines and add to document
-    for line in content.split('\n'):
-        if line.startswith('# '):
-            doc.add_heading(line[2:], 1)
-        elif line.startswith('## '):
-            doc.add_heading(line[3:], 2)
-        elif line.startswith('### '):
-            doc.add_heading(line[4:], 3)
-        elif line.strip():
-            doc.add_paragraph(line)
-    
-    doc.save(output_path)
+def create_docx(content: str, output_path: str, title: str = 'Project Documentation'):
+    """
+    Create a DOCX document from markdown content.
+    Uses Pandoc when it is on PATH (full GFM support: lists, tables, code blocks),
+    otherwise writes the document XML directly.
+    """
+    if PANDOC_AVAILABLE:
+        try:
+            subprocess.run(
+                ['pandoc', '-f', 'gfm', '-t', 'docx', '-M', f'title={title}', '-o', output_path],
+                input=content.encode('utf-8'),
+                capture_output=True,
+                check=True
+            )
+            return
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️  Pandoc conversion failed, using built-in writer: {e.stderr.decode('utf-8', 'ignore').strip()}")
+        except OSError as e:
+            print(f"⚠️  Pandoc conversion failed, using built-in writer: {e}")
+    
+    _write_docx(content, output_path, title)
 
 def parse_code_with_tree_sitter(file_path: str, language: str = 'python') -> Dict:
     """